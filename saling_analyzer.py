@@ -4,13 +4,19 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import io
 import re
+import weakref
 
 from supabase import create_client, Client
+from postgrest.types import CountMethod, ReturnMethod
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry
 except Exception:
     requests = None
 
@@ -72,6 +78,21 @@ h1, h2, h3 { letter-spacing: -0.5px; }
 # =========================
 SALES_COLS = ["품번", "컬러", "가격", "제조방식", "소재명", "핏", "기장", "당시즌판매수량", "당시즌판매액"]
 MATERIAL_COLS = ["소재명", "소재업체", "혼용원단", "혼용율", "중량", "조직", "CT %", "SF %", "FB-LV"]
+SALES_NUM_COLS = ["가격", "당시즌판매수량", "당시즌판매액"]
+MATERIAL_NUM_COLS = ["중량", "CT %", "SF %", "FB-LV"]
+# 필수 텍스트 컬럼 (fill_required_text로 정리 → Arrow 문자열). 소재업체/혼용원단/혼용율/조직은 원본 그대로 유지
+SALES_TEXT_COLS = ["품번", "컬러", "제조방식", "소재명", "핏", "기장"]
+MATERIAL_TEXT_COLS = ["소재명"]
+
+# 조합 예측 입력 옵션 (정적 → rerun마다 새로 만들지 않음)
+GENDER_OPTIONS = ("남성", "여성", "공용")
+MANUFACTURING_OPTIONS = ("KNIT", "WOVEN", "CUT&SEW")
+FIT_OPTIONS = ("REGULAR", "SEMI-OVER", "OVER")
+LENGTH_OPTIONS = ("REGULAR", "LONG", "CROP")
+
+# 홈 챗
+HOME_CHAT_MAX = 40      # 화면에 보여줄(=보관할) 홈 챗 메시지 수
+HOME_CHAT_HISTORY = 12  # assistant에 넘길 최근 대화 수
 
 # =========================
 # Supabase 연결
@@ -99,6 +120,20 @@ def anon_headers() -> dict:
         "Content-Type": "application/json",
     }
 
+# (connect, read): 연결은 빨리 포기, Edge Function 응답은 기존처럼 최대 120초 대기
+HTTP_TIMEOUT = (5, 120)
+
+@st.cache_resource
+def get_http_session():
+    """Edge Function 호출용 keep-alive 세션 (클릭마다 TCP/TLS 핸드셰이크 방지)"""
+    s = requests.Session()
+    # 연결 실패/503만 재시도. 502/504·응답 대기 중 오류(read=0)는 함수가 이미 실행됐을 수 있어 재시도 안 함
+    retry = Retry(total=2, connect=2, read=0, backoff_factor=0.2, status_forcelist=[503],
+                  allowed_methods=frozenset({"POST"}), raise_on_status=False)
+    s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+    s.headers.update(anon_headers())
+    return s
+
 # =========================
 # 유틸
 # =========================
@@ -114,17 +149,29 @@ def show_api_error(out, fallback="요청 실패"):
     return fallback
 
 def make_json_safe_df(df: pd.DataFrame) -> pd.DataFrame:
+    """NaN/±inf → None. 결측이 있는 컬럼만 object로 바꾸고 나머지는 그대로 둠"""
     if df is None or df.empty:
         return df
-    return df.replace([np.nan, np.inf, -np.inf], None)
+    out = df.copy(deep=False)
+    num_cols = set(out.select_dtypes(include="number").columns)
+    for c in out.columns:
+        s = out[c]
+        if c in num_cols:
+            bad = ~np.isfinite(s.to_numpy(dtype="float64", na_value=np.nan))
+        else:
+            bad = s.isna().to_numpy()
+        if bad.any():
+            out[c] = s.astype(object).mask(bad, None)
+    return out
 
 def fill_required_text(df: pd.DataFrame, cols, default="UNKNOWN") -> pd.DataFrame:
-    out = df.copy()
+    out = df.copy(deep=False)
     for c in cols:
         if c not in out.columns:
             out[c] = default
-        out[c] = out[c].astype(str).replace(["None", "nan"], "").fillna("").apply(lambda x: x.strip())
-        out[c] = out[c].replace("", default)
+        # Arrow 문자열로 한 번 변환 후 벡터화 strip (셀 단위 lambda 없음)
+        s = out[c].astype("string[pyarrow]").str.strip()
+        out[c] = s.mask(s.isna() | s.isin(["", "None", "nan"]), default)
     return out
 
 def is_quota_error(out: dict) -> bool:
@@ -133,22 +180,20 @@ def is_quota_error(out: dict) -> bool:
     err = str(out.get("error", "")).lower()
     return ("exceeded your current quota" in err) or ("check your plan and billing" in err)
 
+STYLE_CODE_RE = re.compile(r"\b[A-Z]{1,4}[A-Z0-9]{6,12}\b")
+PREDICTION_KEYS = ["예측", "얼마나", "판매", "수량", "판매액", "팔릴", "보수", "공격", "베이스", "base", "low", "high"]
+PREDICTION_KEY_RE = re.compile("|".join(map(re.escape, PREDICTION_KEYS)))
+
 def extract_style_codes(text: str):
     if not text:
         return []
-    s = text.upper()
-    matches = re.findall(r"\b[A-Z]{1,4}[A-Z0-9]{6,12}\b", s)
-    out = []
-    for m in matches:
-        if m not in out:
-            out.append(m)
-    return out[:3]
+    # dict.fromkeys: 등장 순서를 유지한 중복 제거
+    return list(dict.fromkeys(STYLE_CODE_RE.findall(text.upper())))[:3]
 
 def wants_prediction(text: str) -> bool:
     if not text:
         return False
-    keys = ["예측", "얼마나", "판매", "수량", "판매액", "팔릴", "보수", "공격", "베이스", "base", "low", "high"]
-    return any(k in text for k in keys)
+    return PREDICTION_KEY_RE.search(text) is not None
 
 def infer_gender(text: str) -> str:
     if not text:
@@ -178,76 +223,155 @@ def infer_item_name(text: str) -> str:
 # =========================
 # ✅ DB 직접 조회 (해결책 A 강화 버전)
 # =========================
+def session_lookup(data_key: str, key_col: str, key: str):
+    """세션 DataFrame에서 key_col(strip/대문자) == key인 첫 행 dict. 없으면 None
+    인덱스는 {키: 행 위치}만 보관 (프레임 사본 없음), 프레임 객체가 바뀔 때만 재구성
+    프레임은 약한 참조로만 기억 → 새로고침/삭제로 교체된 이전 프레임이 인덱스 때문에 남지 않음"""
+    df = st.session_state.get(data_key)
+    if df is None or df.empty:
+        return None
+    cached = st.session_state.get(f"{data_key}_index")
+    if cached is None or cached[0]() is not df:
+        keys = df[key_col].fillna("").astype(str).str.strip().str.upper()
+        idx = {}
+        for pos, k in enumerate(keys):
+            idx.setdefault(k, pos)
+        cached = (weakref.ref(df), idx)
+        st.session_state[f"{data_key}_index"] = cached
+    pos = cached[1].get(key)
+    if pos is None:
+        return None
+    return make_json_safe_df(df.iloc[[pos]]).to_dict("records")[0]
+
+def like_escape(s: str) -> str:
+    """ilike 패턴용 이스케이프: \\ % _ 를 문자 그대로 매칭
+    (PostgREST는 *도 %로 바꾸므로 *는 한 글자 와일드카드 _로 대체)"""
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("*", "_")
+
+def db_key(s: str) -> str:
+    """DB 조회/캐시 키. ilike는 대소문자 무시라 대문자로 통일하되,
+    *가 든 키는 1단계가 대소문자를 구분하는 eq이므로 원래 대소문자 유지"""
+    return s if "*" in s else s.upper()
+
+def fetch_row_like(table: str, col: str, key: str):
+    """대소문자 무시 일치 → %...% 포함 매칭. 키의 % _ 는 와일드카드가 아닌 문자로 취급
+    (*가 든 키는 ilike로 정확히 표현할 수 없어 1단계를 eq로 조회 → key는 원래 대소문자여야 함)"""
+    q = supabase.table(table).select("*")
+    if "*" in key:
+        r1 = q.eq(col, key).limit(1).execute()
+    else:
+        r1 = q.ilike(col, like_escape(key)).limit(1).execute()
+    if r1.data:
+        return r1.data[0]
+    r2 = supabase.table(table).select("*").ilike(col, f"%{like_escape(key)}%").limit(1).execute()
+    if r2.data:
+        return r2.data[0]
+    return None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_sales_row(code: str):
+    """품번을 최대한 넓게 매칭 (공백/추가문자 포함 대비)
+    같은 품번 재질문 시 DB 왕복 생략. 예외는 캐시되지 않도록 호출부에서 처리"""
+    return fetch_row_like("sales_data", "품번", code)
+
 def db_get_sales_row_by_code(item_code: str):
-    """품번을 최대한 넓게 매칭: eq → ilike → ilike %...%"""
-    if supabase is None or not item_code:
+    """품번: 세션 인덱스(eq/대소문자 무시) → DB"""
+    if not item_code:
         return None
     code = str(item_code).strip()
+    row = session_lookup("sales_data", "품번", code.upper())
+    if row is not None:
+        return row
+    if supabase is None:
+        return None
     try:
-        # 1) 정확 일치
-        r1 = supabase.table("sales_data").select("*").eq("품번", code).limit(1).execute()
-        if r1.data:
-            return r1.data[0]
-        # 2) 대소문자 무시(패턴 없이도 동작하는 경우가 많지만 안전하게)
-        r2 = supabase.table("sales_data").select("*").ilike("품번", code).limit(1).execute()
-        if r2.data:
-            return r2.data[0]
-        # 3) 공백/추가문자 포함 대비
-        r3 = supabase.table("sales_data").select("*").ilike("품번", f"%{code}%").limit(1).execute()
-        if r3.data:
-            return r3.data[0]
+        return fetch_sales_row(db_key(code))
     except Exception:
         return None
-    return None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_sales_code_suggestions(q: str, limit: int):
+    r = supabase.table("sales_data").select("품번").ilike("품번", f"%{like_escape(q)}%").limit(limit).execute()
+    return [x.get("품번") for x in (r.data or []) if x.get("품번")]
 
 def db_suggest_sales_codes(partial: str, limit: int = 10):
     """못 찾을 때 후보 품번 추천"""
     if supabase is None or not partial:
         return []
-    q = str(partial).strip()
     try:
-        r = supabase.table("sales_data").select("품번").ilike("품번", f"%{q}%").limit(limit).execute()
-        return [x.get("품번") for x in (r.data or []) if x.get("품번")]
+        return fetch_sales_code_suggestions(str(partial).strip().upper(), limit)
     except Exception:
         return []
 
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_material_row(name: str):
+    """소재명: 대소문자 무시 일치 → %...% 포함"""
+    return fetch_row_like("material_data", "소재명", name)
+
 def db_get_material_row_by_name(material_name: str):
-    """소재명: eq → ilike → ilike %...%"""
-    if supabase is None or not material_name:
+    """소재명: 세션 인덱스(eq/대소문자 무시) → DB"""
+    if not material_name:
         return None
     name = str(material_name).strip()
+    row = session_lookup("material_data", "소재명", name.upper())
+    if row is not None:
+        return row
+    if supabase is None:
+        return None
     try:
-        r1 = supabase.table("material_data").select("*").eq("소재명", name).limit(1).execute()
-        if r1.data:
-            return r1.data[0]
-        r2 = supabase.table("material_data").select("*").ilike("소재명", name).limit(1).execute()
-        if r2.data:
-            return r2.data[0]
-        r3 = supabase.table("material_data").select("*").ilike("소재명", f"%{name}%").limit(1).execute()
-        if r3.data:
-            return r3.data[0]
+        return fetch_material_row(db_key(name))
     except Exception:
         return None
-    return None
+
+# =========================
+# 정규화(로드/저장 공통)
+# =========================
+def downcast_int(s: pd.Series) -> pd.Series:
+    """정수값뿐이면 int32로 축소 (int32 범위를 넘으면 원래 dtype 유지)"""
+    # 범위 초과 float를 to_numeric에 넘기면 int64로 바뀌고 캐스트 경고가 나므로 먼저 거름
+    if s.abs().max() > np.iinfo(np.int32).max:
+        return s
+    out = pd.to_numeric(s, downcast="integer")
+    if out.dtype.kind == "i" and out.dtype.itemsize < 4:
+        out = out.astype("int32")
+    return out
+
+def normalize_sales_df(df: pd.DataFrame) -> pd.DataFrame:
+    """SALES_COLS만 남기고 숫자/필수 텍스트 정리 (여러 번 적용해도 결과 동일)"""
+    out = df.reindex(columns=SALES_COLS)
+    out[SALES_NUM_COLS] = (
+        out[SALES_NUM_COLS].apply(pd.to_numeric, errors="coerce").fillna(0).apply(downcast_int)
+    )
+    # 텍스트는 Arrow 문자열(연속 UTF-8 버퍼)로 보관 (fill_required_text가 변환)
+    return fill_required_text(out, SALES_TEXT_COLS)
+
+def normalize_material_df(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.reindex(columns=MATERIAL_COLS)
+    out[MATERIAL_NUM_COLS] = out[MATERIAL_NUM_COLS].apply(pd.to_numeric, errors="coerce")
+    return fill_required_text(out, MATERIAL_TEXT_COLS, default="UNKNOWN_MATERIAL")
+
+def append_rows(base: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """방금 저장한 행을 세션 데이터에 붙임 (저장 후 전체 SELECT 재조회 대신)"""
+    if base is None or base.empty:
+        return new_rows.reset_index(drop=True)
+    return pd.concat([base, new_rows], ignore_index=True)
 
 # =========================
 # 데이터 로드(캐시)
 # =========================
+def select_cols(cols) -> str:
+    """PostgREST select 문자열. "CT %" 같은 공백/특수문자 컬럼 때문에 따옴표 필요"""
+    return ",".join(f'"{c}"' for c in cols)
+
 @st.cache_data(ttl=600)
 def load_sales_data():
     if supabase is None:
         return pd.DataFrame(columns=SALES_COLS)
     try:
-        res = supabase.table("sales_data").select("*").execute()
-        df = pd.DataFrame(res.data or [])
-        for c in SALES_COLS:
-            if c not in df.columns:
-                df[c] = None
-        df = df[SALES_COLS].copy()
-        for col in ["가격", "당시즌판매수량", "당시즌판매액"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-        df = fill_required_text(df, ["품번","컬러","제조방식","소재명","핏","기장"])
-        return df
+        res = supabase.table("sales_data").select(select_cols(SALES_COLS)).execute()
+        # columns= 지정 → 컬럼 탐색/재정렬 없이 한 번에 생성 (누락 컬럼은 NaN)
+        df = pd.DataFrame.from_records(res.data or [], columns=SALES_COLS)
+        return normalize_sales_df(df)
     except Exception:
         return pd.DataFrame(columns=SALES_COLS)
 
@@ -256,83 +380,147 @@ def load_material_data():
     if supabase is None:
         return pd.DataFrame(columns=MATERIAL_COLS)
     try:
-        res = supabase.table("material_data").select("*").execute()
-        df = pd.DataFrame(res.data or [])
-        for c in MATERIAL_COLS:
-            if c not in df.columns:
-                df[c] = None
-        df = df[MATERIAL_COLS].copy()
-        for col in ["중량","CT %","SF %","FB-LV"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-        df = fill_required_text(df, ["소재명"], default="UNKNOWN_MATERIAL")
-        return df
+        res = supabase.table("material_data").select(select_cols(MATERIAL_COLS)).execute()
+        df = pd.DataFrame.from_records(res.data or [], columns=MATERIAL_COLS)
+        return normalize_material_df(df)
     except Exception:
         return pd.DataFrame(columns=MATERIAL_COLS)
 
 # =========================
 # 저장 함수(업로드용)
 # =========================
-def save_sales_data(new_df: pd.DataFrame) -> bool:
+INSERT_CHUNK_ROWS = 500
+INSERT_WORKERS = 4
+
+def insert_chunked(table: str, recs: list) -> list:
+    """recs를 INSERT_CHUNK_ROWS 단위로 나눠 병렬 insert (네트워크 대기 중첩)
+    반환: 실패한 배치의 (배치번호, 에러) 목록. 한 배치가 실패해도 나머지는 계속 진행"""
+    chunks = [recs[i:i + INSERT_CHUNK_ROWS] for i in range(0, len(recs), INSERT_CHUNK_ROWS)]
+    # return=minimal: 삽입된 행을 응답으로 되돌려 받지 않음 (응답 직렬화/파싱 생략)
+    def _insert(chunk):
+        try:
+            supabase.table(table).insert(chunk, returning=ReturnMethod.minimal).execute()
+            return None
+        except Exception as e:
+            return e
+    if len(chunks) == 1:
+        results = [_insert(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=INSERT_WORKERS) as ex:
+            results = list(ex.map(_insert, chunks))
+    return [(i + 1, e) for i, e in enumerate(results) if e is not None]
+
+def report_insert_failures(failed: list, total_rows: int) -> None:
+    total = -(-total_rows // INSERT_CHUNK_ROWS)
+    st.error(f"❌ 저장 실패: {len(failed)}/{total}개 배치 ({INSERT_CHUNK_ROWS}행 단위). "
+             "나머지 배치는 이미 저장되었으니 다시 저장하면 중복됩니다. 아래 행만 다시 업로드하세요.")
+    for no, e in failed:
+        # 업로드 파일 기준 1부터 세는 행 번호 (헤더 제외)
+        first, last = (no - 1) * INSERT_CHUNK_ROWS + 1, min(no * INSERT_CHUNK_ROWS, total_rows)
+        st.caption(f"배치 #{no} (행 {first}–{last}): {e}")
+
+def save_sales_data(new_rows: pd.DataFrame) -> bool:
+    """new_rows: normalize_sales_df 결과 (호출부에서 한 번만 정규화 → 세션 append에도 그대로 사용)"""
     if supabase is None:
         st.error("Supabase 연결 없음")
         return False
-    df = new_df.copy()
-    for c in SALES_COLS:
-        if c not in df.columns:
-            df[c] = None
-    df = fill_required_text(df, ["품번","컬러","제조방식","소재명","핏","기장"])
-    for col in ["가격", "당시즌판매수량", "당시즌판매액"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-    df = make_json_safe_df(df)
-    recs = df[SALES_COLS].to_dict("records")
+    # 정규화된 프레임은 SALES_COLS만 있으므로 JSON 정리는 전송 컬럼에만 적용됨
+    recs = make_json_safe_df(new_rows).to_dict("records")
     if not recs:
         return False
-    supabase.table("sales_data").insert(recs).execute()
-    st.cache_data.clear()
+    failed = insert_chunked("sales_data", recs)
+    st.cache_data.clear()  # 부분 성공도 반영되도록 실패 여부와 무관하게 초기화
+    if failed:
+        report_insert_failures(failed, len(recs))
+        return False
     return True
 
-def save_material_data(new_df: pd.DataFrame) -> bool:
+def save_material_data(new_rows: pd.DataFrame) -> bool:
+    """new_rows: normalize_material_df 결과"""
     if supabase is None:
         st.error("Supabase 연결 없음")
         return False
-    df = new_df.copy()
-    for c in MATERIAL_COLS:
-        if c not in df.columns:
-            df[c] = None
-    df = fill_required_text(df, ["소재명"], default="UNKNOWN_MATERIAL")
-    for col in ["중량","CT %","SF %","FB-LV"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-    df = make_json_safe_df(df)
-    recs = df[MATERIAL_COLS].to_dict("records")
+    recs = make_json_safe_df(new_rows).to_dict("records")
     if not recs:
         return False
-    supabase.table("material_data").insert(recs).execute()
-    st.cache_data.clear()
+    failed = insert_chunked("material_data", recs)
+    st.cache_data.clear()  # 부분 성공도 반영되도록 실패 여부와 무관하게 초기화
+    if failed:
+        report_insert_failures(failed, len(recs))
+        return False
     return True
 
 def delete_all_sales_data() -> bool:
     if supabase is None:
         return False
-    supabase.table("sales_data").delete().neq("id", 0).execute()
+    supabase.table("sales_data").delete(returning=ReturnMethod.minimal).neq("id", 0).execute()
     st.cache_data.clear()
     return True
 
 def delete_all_material_data() -> bool:
     if supabase is None:
         return False
-    supabase.table("material_data").delete().neq("id", 0).execute()
+    supabase.table("material_data").delete(returning=ReturnMethod.minimal).neq("id", 0).execute()
     st.cache_data.clear()
     return True
 
+# =========================
+# 업로드(Excel) 읽기
+# =========================
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_upload_xlsx(data: bytes, cols: tuple) -> pd.DataFrame:
+    """필요한 컬럼만 파싱. 파일 내용 기준 캐시 → 저장 버튼 클릭 rerun 때 재파싱 방지"""
+    return pd.read_excel(io.BytesIO(data), engine="calamine", usecols=lambda c: c in cols)
+
+# =========================
+# 다운로드(Excel) 캐시
+# =========================
+@st.cache_data(show_spinner=False)
+def build_xlsx_bytes(df: pd.DataFrame, sheet_name: str) -> bytes:
+    """xlsxwriter로 직렬화. 같은 데이터면 rerun마다 다시 만들지 않음
+    (pandas는 열 단위로 셀을 쓰므로 constant_memory 옵션은 사용 불가)"""
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False)
+def build_csv_bytes(df: pd.DataFrame) -> bytes:
+    """CSV 빠른 경로 (utf-8-sig: Excel에서 한글이 깨지지 않도록 BOM 포함)"""
+    return df.to_csv(index=False).encode("utf-8-sig")
+
 # =========================
 # Session State 초기화
 # =========================
-if "sales_data" not in st.session_state:
-    st.session_state.sales_data = load_sales_data()
-if "material_data" not in st.session_state:
-    st.session_state.material_data = load_material_data()
+# sales_data/material_data는 필요한 메뉴에서 처음 읽을 때 로드 (홈 챗만 쓰면 전체 조회 없음)
+def get_sales_data() -> pd.DataFrame:
+    if "sales_data" not in st.session_state:
+        st.session_state.sales_data = load_sales_data()
+    return st.session_state.sales_data
+
+def get_material_data() -> pd.DataFrame:
+    if "material_data" not in st.session_state:
+        st.session_state.material_data = load_material_data()
+    return st.session_state.material_data
+
+@st.cache_data(ttl=600, show_spinner=False)
+def count_rows(table: str) -> int:
+    """행 수만 조회 (HEAD + count=exact → 본문 없음). 예외는 캐시되지 않도록 호출부에서 처리"""
+    res = supabase.table(table).select("*", count=CountMethod.exact, head=True).execute()
+    return res.count or 0
+
+def data_count(key: str) -> int:
+    """사이드바 현황 표시용. 로드 여부와 무관하게 DB 실제 행 수
+    (로드된 프레임은 PostgREST max-rows로 잘릴 수 있어 len과 다를 수 있음)"""
+    if supabase is None:
+        return 0
+    try:
+        return count_rows(key)
+    except Exception:
+        return 0
+
 if "home_chat" not in st.session_state:
-    st.session_state.home_chat = []
+    st.session_state.home_chat = deque(maxlen=HOME_CHAT_MAX)
 
 # =========================
 # Sidebar
@@ -342,8 +530,8 @@ st.sidebar.markdown(
     f"""
 <div class="card">
   <div class="card-title">📊 데이터 현황</div>
-  <div class="muted">판매 데이터: <b>{len(st.session_state.sales_data):,}</b>건<br/>
-  소재 데이터: <b>{len(st.session_state.material_data):,}</b>건</div>
+  <div class="muted">판매 데이터: <b>{data_count("sales_data"):,}</b>건<br/>
+  소재 데이터: <b>{data_count("material_data"):,}</b>건</div>
 </div>
 """,
     unsafe_allow_html=True,
@@ -377,7 +565,7 @@ if menu == "🏠 홈(챗)":
             st.error("SUPABASE_FUNCTION_ASSIST_URL이 설정되지 않았습니다.")
         else:
             rationale_mode = st.radio("답변 모드", ["md", "exec"], horizontal=True)
-            for m in st.session_state.home_chat[-40:]:
+            for m in st.session_state.home_chat:
                 with st.chat_message(m["role"]):
                     st.markdown(m["content"])
 
@@ -387,15 +575,15 @@ if menu == "🏠 홈(챗)":
                 with st.chat_message("user"):
                     st.markdown(user_msg)
 
-                history = [{"role": m["role"], "content": m["content"]} for m in st.session_state.home_chat[-12:]]
+                history = [{"role": m["role"], "content": m["content"]} for m in list(st.session_state.home_chat)[-HOME_CHAT_HISTORY:]]
 
                 with st.chat_message("assistant"):
                     with st.spinner("답변 생성 중…"):
                         # 1) assistant 시도
                         out = None
                         try:
-                            r = requests.post(fn_assist, json={"question": user_msg, "history": history, "rationale_mode": rationale_mode},
-                                              headers=anon_headers(), timeout=120)
+                            r = get_http_session().post(fn_assist, json={"question": user_msg, "history": history, "rationale_mode": rationale_mode},
+                                                        timeout=HTTP_TIMEOUT)
                             out = safe_json(r)
                         except Exception as e:
                             out = {"ok": False, "error": str(e)}
@@ -476,7 +664,7 @@ if menu == "🏠 홈(챗)":
                                         "supplier": (mat_row or {}).get("소재업체"),
                                     }
                                 }
-                                rr = requests.post(fn_predict, json=pred_payload, headers=anon_headers(), timeout=120)
+                                rr = get_http_session().post(fn_predict, json=pred_payload, timeout=HTTP_TIMEOUT)
                                 pout = safe_json(rr)
 
                                 if isinstance(pout, dict) and pout.get("ok"):
@@ -509,7 +697,7 @@ if menu == "🏠 홈(챗)":
                             st.session_state.home_chat.append({"role": "assistant", "content": ans})
 
             if st.button("🧹 홈 챗 기록 지우기", use_container_width=True):
-                st.session_state.home_chat = []
+                st.session_state.home_chat = deque(maxlen=HOME_CHAT_MAX)
                 st.rerun()
 
 # =========================================================
@@ -526,12 +714,12 @@ elif menu == "🎯 조합 예측(AI)":
         else:
             c1, c2 = st.columns(2)
             with c1:
-                gender = st.selectbox("성별", ["남성","여성","공용"])
+                gender = st.selectbox("성별", GENDER_OPTIONS)
                 item_name = st.text_input("아이템명", value="긴팔티셔츠")
-                manufacturing = st.selectbox("제조방식", ["KNIT","WOVEN","CUT&SEW"])
+                manufacturing = st.selectbox("제조방식", MANUFACTURING_OPTIONS)
                 material = st.text_input("소재명", value="")
-                fit = st.selectbox("핏", ["REGULAR","SEMI-OVER","OVER"])
-                length = st.selectbox("기장", ["REGULAR","LONG","CROP"])
+                fit = st.selectbox("핏", FIT_OPTIONS)
+                length = st.selectbox("기장", LENGTH_OPTIONS)
                 price = st.number_input("가격", min_value=0, step=1000, value=149000)
                 mode = st.radio("근거 모드", ["md","exec"], horizontal=True)
                 run = st.button("예측 실행", type="primary")
@@ -559,7 +747,7 @@ elif menu == "🎯 조합 예측(AI)":
                             "supplier": (mat_row or {}).get("소재업체"),
                         }
                     }
-                    rr = requests.post(fn_predict, json=payload, headers=anon_headers(), timeout=120)
+                    rr = get_http_session().post(fn_predict, json=payload, timeout=HTTP_TIMEOUT)
                     out = safe_json(rr)
                     if isinstance(out, dict) and out.get("ok"):
                         res = out.get("result", {}) or {}
@@ -582,32 +770,35 @@ elif menu == "📥 데이터 입력":
     with tab1:
         up = st.file_uploader("판매 Excel 업로드", type=["xlsx","xls"])
         if up:
-            df = pd.read_excel(up)
-            df = make_json_safe_df(df)
+            df = read_upload_xlsx(up.getvalue(), tuple(SALES_COLS))
             miss = [c for c in SALES_COLS if c not in df.columns]
             if miss:
                 st.error(f"컬럼 누락: {miss}")
             else:
                 st.dataframe(df.head(30), use_container_width=True)
                 if st.button("판매 저장(추가 Insert)"):
-                    if save_sales_data(df):
-                        st.session_state.sales_data = load_sales_data()
+                    new_rows = normalize_sales_df(df)
+                    if save_sales_data(new_rows):
+                        # 이미 로드된 경우만 붙임 (미로드면 다음 지연 로드가 새 행까지 조회)
+                        if "sales_data" in st.session_state:
+                            st.session_state.sales_data = append_rows(st.session_state.sales_data, new_rows)
                         st.success("완료")
                         st.rerun()
 
     with tab2:
         up = st.file_uploader("소재 Excel 업로드", type=["xlsx","xls"], key="mat_up")
         if up:
-            df = pd.read_excel(up)
-            df = make_json_safe_df(df)
+            df = read_upload_xlsx(up.getvalue(), tuple(MATERIAL_COLS))
             miss = [c for c in MATERIAL_COLS if c not in df.columns]
             if miss:
                 st.error(f"컬럼 누락: {miss}")
             else:
                 st.dataframe(df.head(30), use_container_width=True)
                 if st.button("소재 저장(추가 Insert)"):
-                    if save_material_data(df):
-                        st.session_state.material_data = load_material_data()
+                    new_rows = normalize_material_df(df)
+                    if save_material_data(new_rows):
+                        if "material_data" in st.session_state:
+                            st.session_state.material_data = append_rows(st.session_state.material_data, new_rows)
                         st.success("완료")
                         st.rerun()
 
@@ -616,7 +807,7 @@ elif menu == "📥 데이터 입력":
 # =========================================================
 elif menu == "📊 대시보드":
     st.title("📊 대시보드")
-    df = st.session_state.sales_data.copy()
+    df = get_sales_data()
     if df.empty:
         st.info("데이터 없음")
     else:
@@ -633,10 +824,10 @@ elif menu == "💾 데이터 관리":
     with tab1:
         st.subheader("판매 데이터")
         st.caption("현재 DB에 입력된 데이터를 확인/편집할 수 있습니다. (편집은 화면에서만, 저장 기능은 필요시 추가)")
-        st.dataframe(st.session_state.sales_data, use_container_width=True, height=360)
+        st.dataframe(get_sales_data(), use_container_width=True, height=360)
 
         st.subheader("소재 데이터")
-        st.dataframe(st.session_state.material_data, use_container_width=True, height=360)
+        st.dataframe(get_material_data(), use_container_width=True, height=360)
 
         if st.button("🔄 DB 새로고침(캐시 초기화)", use_container_width=True):
             st.cache_data.clear()
@@ -647,30 +838,36 @@ elif menu == "💾 데이터 관리":
 
     with tab2:
         st.subheader("판매 데이터 다운로드")
-        if not st.session_state.sales_data.empty:
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                st.session_state.sales_data.to_excel(writer, index=False, sheet_name="sales_data")
+        if not get_sales_data().empty:
             st.download_button(
                 "⬇️ 판매 데이터 Excel 다운로드",
-                buf.getvalue(),
+                build_xlsx_bytes(get_sales_data(), "sales_data"),
                 f"sales_data_{datetime.now().strftime('%Y%m%d')}.xlsx",
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+            st.download_button(
+                "⬇️ 판매 데이터 CSV 다운로드",
+                build_csv_bytes(get_sales_data()),
+                f"sales_data_{datetime.now().strftime('%Y%m%d')}.csv",
+                "text/csv"
+            )
         else:
             st.info("판매 데이터 없음")
 
         st.subheader("소재 데이터 다운로드")
-        if not st.session_state.material_data.empty:
-            buf = io.BytesIO()
-            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-                st.session_state.material_data.to_excel(writer, index=False, sheet_name="material_data")
+        if not get_material_data().empty:
             st.download_button(
                 "⬇️ 소재 데이터 Excel 다운로드",
-                buf.getvalue(),
+                build_xlsx_bytes(get_material_data(), "material_data"),
                 f"material_data_{datetime.now().strftime('%Y%m%d')}.xlsx",
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+            st.download_button(
+                "⬇️ 소재 데이터 CSV 다운로드",
+                build_csv_bytes(get_material_data()),
+                f"material_data_{datetime.now().strftime('%Y%m%d')}.csv",
+                "text/csv"
+            )
         else:
             st.info("소재 데이터 없음")
 